@@ -15,4 +15,27 @@ DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
 DASHVECTOR_API_KEY = os.getenv("DASHVECTOR_API_KEY")
 DASHVECTOR_ENDPOINT = os.getenv("DASHVECTOR_ENDPOINT")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "mcp_services_collection")
-EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
\ No newline at end of file
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+# DashScope text-embedding-v4 accepts at most 10 inputs per request
+EMBEDDING_BATCH_SIZE = min(int(os.getenv("EMBEDDING_BATCH_SIZE", "10")), 10)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+# Router cache configuration
+ENDPOINT_CACHE_TTL = float(os.getenv("ENDPOINT_CACHE_TTL", "300"))
+ENDPOINT_CACHE_SIZE = int(os.getenv("ENDPOINT_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "300"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SSE_SESSION_IDLE_TIMEOUT = float(os.getenv("SSE_SESSION_IDLE_TIMEOUT", "300"))
+EXEC_FANOUT_CONCURRENCY = int(os.getenv("EXEC_FANOUT_CONCURRENCY", "16"))
+TOOLS_CACHE_TTL = float(os.getenv("TOOLS_CACHE_TTL", "600"))
+TOOLS_CACHE_SIZE = int(os.getenv("TOOLS_CACHE_SIZE", "1024"))
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+
+# Local sidecar store for server name -> endpoint lookups; entries older than
+# ROUTER_KV_TTL seconds are re-checked against DashVector
+ROUTER_KV_PATH = os.getenv("ROUTER_KV_PATH", "router_kv.db")
+ROUTER_KV_TTL = float(os.getenv("ROUTER_KV_TTL", "300"))
+
+# Worker threads for blocking DashScope/DashVector calls
+DISCOVERY_THREADS = int(os.getenv("DISCOVERY_THREADS", "64"))
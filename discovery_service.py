@@ -1,8 +1,102 @@
 import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import grpc
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 import dashscope
 from dashscope import TextEmbedding
-from dashvector import Client, Doc
-from config import DASHSCOPE_API_KEY, DASHVECTOR_API_KEY, DASHVECTOR_ENDPOINT, COLLECTION_NAME, EMBEDDING_DIMENSION
+from dashvector import Client, Doc, DashVectorCode
+from config import (
+    DASHSCOPE_API_KEY, DASHVECTOR_API_KEY, DASHVECTOR_ENDPOINT, COLLECTION_NAME, EMBEDDING_DIMENSION,
+    EMBEDDING_BATCH_SIZE, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_THRESHOLD, WARMUP_ON_START,
+    ROUTER_KV_PATH, ROUTER_KV_TTL, EMBEDDING_CACHE_SIZE
+)
+from query_cache import QueryCache
+
+
+# The DashVector SDK reports failures through falsy responses rather than
+# exceptions; these codes mean the connection, not the request, was at fault.
+# Over gRPC the SDK reports the integer grpc.StatusCode value.
+TRANSIENT_CODES = (
+    DashVectorCode.Timeout,
+    DashVectorCode.Closed,
+    grpc.StatusCode.UNAVAILABLE.value[0],
+    grpc.StatusCode.DEADLINE_EXCEEDED.value[0],
+)
+
+
+def _is_transient(rsp):
+    """Whether a failed DashVector response was caused by a connection problem."""
+    return rsp.code in TRANSIENT_CODES
+
+# Metadata fields stored for every server document
+SERVER_FIELDS = ['server_description', 'server_endpoint', 'tools']
+
+# DashVector accepts at most this many documents per insert request
+INSERT_BATCH_SIZE = 1024
+
+
+class _PersistentSession(requests.Session):
+    """A requests session that stays open across DashScope's per-call `with requests.Session()` blocks."""
+
+    def close(self):
+        pass
+
+
+class _ThreadLocalRequests:
+    """Stand-in for the requests module whose Session() returns one pooled session per thread."""
+
+    def __init__(self, pool_connections, pool_maxsize):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._local = threading.local()
+
+    def Session(self):
+        # requests.Session is not documented as thread-safe, so each worker
+        # thread gets its own session and connection pool
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = _PersistentSession()
+            adapter = HTTPAdapter(pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return session
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+def _share_dashscope_session(pool_connections=4, pool_maxsize=4):
+    """
+    Make DashScope reuse pooled HTTP sessions instead of opening one per call.
+
+    DashScope's HTTP layer creates a new requests.Session for every request, so each
+    embedding call pays a fresh TLS handshake. This relies on SDK internals
+    (dashscope.api_entities.http_request using the requests module) and leaves the
+    SDK untouched if they change.
+
+    Args:
+        pool_connections (int): Number of hosts to keep pools for, per thread
+        pool_maxsize (int): Connections kept per host, per thread
+
+    Returns:
+        bool: Whether the pooled sessions were installed
+    """
+    try:
+        from dashscope.api_entities import http_request
+    except ImportError:
+        return False
+    if getattr(http_request, "requests", None) is not requests:
+        return False
+
+    http_request.requests = _ThreadLocalRequests(pool_connections, pool_maxsize)
+    return True
 
 
 class DiscoveryService:
@@ -11,34 +105,246 @@ class DiscoveryService:
         # Set API keys
         dashscope.api_key = DASHSCOPE_API_KEY
         
+        # Reuse pooled keep-alive connections for DashScope calls
+        _share_dashscope_session()
+        
         # Initialize DashVector client
-        self.client = Client(
+        self._collection = None
+        self._collection_lock = threading.Lock()
+        self.client = self._new_client()
+        
+        # Get or create collection
+        self._collection = self._connect_collection()
+
+        # Local store of server endpoints, so dispatch doesn't need DashVector.
+        # Rows are keyed by collection, so a store shared between collections
+        # never serves another collection's endpoints
+        self._kv = sqlite3.connect(ROUTER_KV_PATH, check_same_thread=False)
+        self._kv_lock = threading.Lock()
+        self._kv_scope = f"{DASHVECTOR_ENDPOINT}/{COLLECTION_NAME}"
+        with self._kv_lock, self._kv:
+            # Earlier versions kept an unscoped table without expiry
+            self._kv.execute("DROP TABLE IF EXISTS endpoints")
+            self._kv.execute(
+                "CREATE TABLE IF NOT EXISTS server_endpoints("
+                "scope TEXT, name TEXT, endpoint TEXT, stored_at REAL, PRIMARY KEY (scope, name))"
+            )
+
+        # Cache of text hash -> normalized embedding, kept in LRU order
+        self._embed_cache = OrderedDict()
+        self._embed_cache_lock = threading.Lock()
+
+        # Cache of recent search results keyed on the query embedding
+        self.query_cache = QueryCache(
+            max_size=SEMANTIC_CACHE_SIZE,
+            ttl=SEMANTIC_CACHE_TTL,
+            threshold=SEMANTIC_CACHE_THRESHOLD
+        )
+
+        # Open connections to DashScope and DashVector before the first request
+        if WARMUP_ON_START:
+            threading.Thread(target=self._warmup, name="discovery-warmup", daemon=True).start()
+
+    @property
+    def collection(self):
+        """DashVector collection handle, reacquired after a reconnect."""
+        collection = self._collection
+        if collection is None:
+            collection = self._connect_collection()
+            with self._collection_lock:
+                if self._collection is None:
+                    self._collection = collection
+                collection = self._collection
+        return collection
+
+    @staticmethod
+    def _new_client():
+        """Create a DashVector client."""
+        # gRPC by default, which keeps one long-lived HTTP/2 channel, so it
+        # needs no pooling of its own
+        return Client(
             api_key=DASHVECTOR_API_KEY,
             endpoint=DASHVECTOR_ENDPOINT
         )
-        
-        # Get or create collection
+
+    @staticmethod
+    def _close_client(client):
+        """Close a DashVector client and its channel."""
+        if client:
+            client.close()
+        elif getattr(client, "_handler", None) is not None:
+            # Client.close skips clients whose startup check failed, but their
+            # channel is open all the same
+            client._handler.close()
+
+    def _reconnect(self):
+        """
+        Drop the collection handle, replacing the client if it is unusable.
+
+        A working client's gRPC channel re-establishes the connection by itself, so
+        it is kept. A client whose startup check failed, or that was closed, stays
+        unusable and is replaced and closed.
+        """
+        client = self.client
+        if not client:
+            # Connect outside the lock; whichever client loses a race is closed
+            new_client = self._new_client()
+            with self._collection_lock:
+                replaced = self.client is client
+                if replaced:
+                    self.client = new_client
+            self._close_client(client if replaced else new_client)
+
+        with self._collection_lock:
+            self._collection = None
+
+    def _connect_collection(self, retries=3, backoff=0.5):
+        """
+        Get or create the DashVector collection, retrying transient connection errors.
+
+        Args:
+            retries (int): Number of retries after the first attempt
+            backoff (float): Initial delay in seconds, doubled after each retry
+        """
+        for attempt in range(retries + 1):
+            collection = self._get_or_create_collection()
+            if collection:
+                return collection
+            if attempt == retries or not _is_transient(collection):
+                raise Exception(f"Failed to get DashVector collection: {collection.message}")
+            time.sleep(backoff * (2 ** attempt))
+            self._reconnect()
+
+    def _call_collection(self, method, *args, retry=True, **kwargs):
+        """
+        Call a collection method, reconnecting if it fails because of the connection.
+
+        Args:
+            method (str): Name of the Collection method
+            retry (bool): Whether to repeat the call once after reconnecting; off for
+                writes, which may have been applied before the connection failed
+
+        Returns:
+            DashVectorResponse: The (possibly falsy) response
+        """
+        rsp = getattr(self.collection, method)(*args, **kwargs)
+        if not rsp and _is_transient(rsp):
+            self._reconnect()
+            if retry:
+                rsp = getattr(self.collection, method)(*args, **kwargs)
+        return rsp
+
+    def _get_or_create_collection(self):
+        """
+        Get the DashVector collection, creating it if it doesn't exist.
+
+        Returns:
+            Collection: The collection, or a falsy handle if it could not be fetched
+        """
+        collection = self.client.get(COLLECTION_NAME)
+        # Client.get reports every failure, including connection errors, with a
+        # falsy handle, so only a collection the server says is missing is created
+        if collection.code != DashVectorCode.InexistentCollection:
+            return collection
+
+        # Embeddings are normalized, so dot product ranks the same as cosine and
+        # is cheaper to compute
+        rsp = self.client.create(COLLECTION_NAME, EMBEDDING_DIMENSION, metric="dotproduct")
+        # Another router may have created it since the get
+        if not rsp and rsp.code != DashVectorCode.DuplicateCollection:
+            if _is_transient(rsp):
+                return rsp
+            raise Exception(f"Failed to create DashVector collection: {rsp.message}")
+        return self.client.get(COLLECTION_NAME)
+
+    def _warmup(self):
+        """Issue throwaway requests so later calls reuse established connections."""
         try:
-            self.collection = self.client.get(COLLECTION_NAME)
+            self._generate_embedding("warmup")
+            self.collection.query([0.0] * EMBEDDING_DIMENSION, topk=1)
         except Exception:
-            # If collection doesn't exist, create it
-            rsp = self.client.create(COLLECTION_NAME, EMBEDDING_DIMENSION)
-            if not rsp:
-                raise Exception("Failed to create DashVector collection")
-            self.collection = self.client.get(COLLECTION_NAME)
-            if not self.collection:
-                raise Exception("Failed to get DashVector collection after creation")
+            pass  # Warmup is best effort
+
+    def _store_endpoints(self, rows):
+        """
+        Record server endpoints in the local store.
+
+        Args:
+            rows (list): (name, endpoint) tuples
+        """
+        now = time.time()
+        with self._kv_lock, self._kv:
+            self._kv.executemany(
+                "INSERT OR REPLACE INTO server_endpoints(scope, name, endpoint, stored_at) VALUES (?, ?, ?, ?)",
+                [(self._kv_scope, name, endpoint, now) for name, endpoint in rows]
+            )
 
     def _generate_embedding(self, text):
-        """Generate embedding for text using DashScope's text-embedding-v4 model."""
-        rsp = TextEmbedding.call(
-            model=TextEmbedding.Models.text_embedding_v4,
-            input=text
-        )
-        if rsp.status_code != 200:
-            raise Exception(f"Failed to generate embedding: {rsp.message}")
-        embeddings = [record['embedding'] for record in rsp.output['embeddings']]
-        return embeddings[0] if isinstance(text, str) else embeddings
+        """
+        Generate embeddings using DashScope's text-embedding-v4 model.
+
+        Args:
+            text (str | list): A single text or a list of texts
+
+        Returns:
+            np.ndarray: The L2-normalized float32 embedding of shape (D,) for a
+                str input, or a (N, D) matrix of embeddings in input order
+        """
+        texts = [text] if isinstance(text, str) else list(text)
+        if not texts:
+            return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+
+        # Reuse cached embeddings and only send each distinct uncached text once
+        keys = [hashlib.blake2b(t.encode(), digest_size=16).hexdigest() for t in texts]
+        vectors = {}
+        with self._embed_cache_lock:
+            for key in keys:
+                if key not in vectors and key in self._embed_cache:
+                    self._embed_cache.move_to_end(key)
+                    vectors[key] = self._embed_cache[key]
+        missing = {key: t for key, t in zip(keys, texts) if key not in vectors}
+
+        if missing:
+            fresh = self._call_embedding(list(missing.values()))
+            with self._embed_cache_lock:
+                for key, vector in zip(missing, fresh):
+                    vectors[key] = vector
+                    self._embed_cache[key] = vector
+                    self._embed_cache.move_to_end(key)
+                while len(self._embed_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embed_cache.popitem(last=False)
+
+        # np.stack copies, so callers never share rows with the cache
+        matrix = np.stack([vectors[key] for key in keys])
+        return matrix[0] if isinstance(text, str) else matrix
+
+    def _call_embedding(self, texts):
+        """
+        Embed texts with DashScope, batching requests to the model's input limit.
+
+        Args:
+            texts (list): Non-empty list of texts
+
+        Returns:
+            np.ndarray: (N, D) matrix of L2-normalized float32 embeddings in input order
+        """
+        embeddings = []
+        # The model caps the number of inputs per request, so send texts in batches
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            rsp = TextEmbedding.call(
+                model=TextEmbedding.Models.text_embedding_v4,
+                input=batch
+            )
+            if rsp.status_code != 200:
+                raise Exception(f"Failed to generate embedding: {rsp.message}")
+            records = sorted(rsp.output['embeddings'], key=lambda record: record['text_index'])
+            embeddings.extend(record['embedding'] for record in records)
+
+        # Normalize so the collection can rank by dot product instead of cosine
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return vectors
 
     def add_server(self, server_name, server_description, server_endpoint, tools):
         """
@@ -61,15 +367,74 @@ class DiscoveryService:
         }
         
         # Insert into DashVector using server_name as the document ID
-        rsp = self.collection.insert(
-            Doc(id=server_name, vector=service_vector, fields=service_metadata)
+        rsp = self._call_collection(
+            "insert",
+            Doc(id=server_name, vector=service_vector, fields=service_metadata),
+            retry=False
         )
         
         if not rsp:
             raise Exception(f"Failed to insert server '{server_name}' into DashVector")
         
+        self._store_endpoints([(server_name, server_endpoint)])
+        
+        # Cached search results may no longer reflect the collection
+        self.query_cache.clear()
+        
         return {"status": "success", "message": f"Server '{server_name}' registered."}
 
+    def add_servers(self, servers):
+        """
+        Add multiple MCP servers to the discovery service in one batch.
+
+        Args:
+            servers (list): List of dicts with server_name, server_description,
+                server_endpoint and tools (JSON string) keys
+
+        Returns:
+            dict: Registration status
+        """
+        if not servers:
+            return {"status": "success", "message": "No servers to register."}
+
+        # Generate vectors for all server descriptions in batched requests
+        service_vectors = self._generate_embedding(
+            [server["server_description"] for server in servers]
+        )
+
+        docs = [
+            Doc(
+                id=server["server_name"],
+                vector=service_vector,
+                fields={
+                    "server_description": server["server_description"],
+                    "server_endpoint": server["server_endpoint"],
+                    "tools": server["tools"]  # Already serialized as JSON string
+                }
+            )
+            for server, service_vector in zip(servers, service_vectors)
+        ]
+
+        try:
+            # Insert documents into DashVector in as few requests as it allows
+            for start in range(0, len(docs), INSERT_BATCH_SIZE):
+                rsp = self._call_collection("insert", docs[start:start + INSERT_BATCH_SIZE], retry=False)
+
+                if not rsp:
+                    raise Exception(
+                        f"Failed to insert servers into DashVector ({start} of {len(docs)} registered)"
+                    )
+
+                self._store_endpoints([
+                    (server["server_name"], server["server_endpoint"])
+                    for server in servers[start:start + INSERT_BATCH_SIZE]
+                ])
+        finally:
+            # Cached search results may no longer reflect the collection
+            self.query_cache.clear()
+
+        return {"status": "success", "message": f"{len(docs)} servers registered."}
+
     def search_server(self, query, top_k=3):
         """
         Search for MCP servers based on a query.
@@ -84,26 +449,35 @@ class DiscoveryService:
         # Generate vector for the query
         query_vector = self._generate_embedding(query)
         
+        # Reuse results from a recent, near-identical query
+        cached_results = self.query_cache.get(query_vector, top_k)
+        if cached_results is not None:
+            return cached_results
+        
         # Perform vector search
-        rsp = self.collection.query(
+        rsp = self._call_collection(
+            "query",
             query_vector,
             topk=top_k,
-            output_fields=['server_description', 'server_endpoint', 'tools']
+            output_fields=SERVER_FIELDS
         )
         
         if not rsp:
             raise Exception("Failed to query DashVector")
         
         # Process results
-        results = []
-        for doc in rsp.output:
-            results.append({
+        results = [
+            {
                 "server_name": doc.id,
                 "server_description": doc.fields['server_description'],
                 "server_endpoint": doc.fields['server_endpoint'],
                 "tools": doc.fields['tools'],  # Still a JSON string
                 "score": doc.score
-            })
+            }
+            for doc in rsp.output
+        ]
+        
+        self.query_cache.put(query_vector, top_k, results)
         
         return results
 
@@ -111,30 +485,47 @@ class DiscoveryService:
         """
         Get the endpoint of a specific server by name.
         
+        Looks in the local endpoint store, then fetches the document by ID. No
+        embedding or vector search is involved, so an unknown name fails after at
+        most one DashVector round-trip. Stored endpoints older than ROUTER_KV_TTL
+        are fetched again, so changes made through other routers are picked up.
+        
         Args:
             server_name (str): Name of the server
             
         Returns:
             str: Endpoint URL of the server
-        """
-        # Search for the server by name using search_server
-        # This is the most reliable method given the DashVector implementation
-        try:
-            # Use a search query that should match the server name
-            results = self.search_server(server_name, 20)  # Search for up to 20 matches
-            
-            # Find the exact match
-            for result in results:
-                if result["server_name"] == server_name:
-                    return result["server_endpoint"]
-                    
-            # If not found in first search, try a more general search
-            # and look for exact name match
-            general_results = self.search_server("", 100)  # Search all with empty query
-            for result in general_results:
-                if result["server_name"] == server_name:
-                    return result["server_endpoint"]
-        except Exception as e:
-            pass  # Continue to raise exception
             
-        raise Exception(f"Server '{server_name}' not found")
\ No newline at end of file
+        Raises:
+            Exception: If no server with that name is registered
+        """
+        with self._kv_lock:
+            row = self._kv.execute(
+                "SELECT endpoint, stored_at FROM server_endpoints WHERE scope = ? AND name = ?",
+                (self._kv_scope, server_name)
+            ).fetchone()
+        if row is not None and time.time() - row[1] < ROUTER_KV_TTL:
+            return row[0]
+
+        # Unknown or expired; server_name is the document ID, so look it up
+        # directly instead of running a vector search
+        rsp = self._call_collection("fetch", ids=[server_name])
+        if not rsp:
+            # Keep dispatching to the last known endpoint while DashVector is unreachable
+            if row is not None and _is_transient(rsp):
+                return row[0]
+            raise Exception(f"Failed to fetch server '{server_name}' from DashVector")
+
+        doc = rsp.output.get(server_name)
+        if doc is None:
+            if row is not None:
+                with self._kv_lock, self._kv:
+                    self._kv.execute(
+                        "DELETE FROM server_endpoints WHERE scope = ? AND name = ?",
+                        (self._kv_scope, server_name)
+                    )
+            raise Exception(f"Server '{server_name}' not found")
+
+        self._store_endpoints([(server_name, doc.fields['server_endpoint'])])
+
+        return doc.fields['server_endpoint']
@@ -1,9 +1,17 @@
-import json
+import time
 import asyncio
 import httpx
+import orjson
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from mcp.server.fastmcp import FastMCP
+from config import (
+    ENDPOINT_CACHE_TTL, ENDPOINT_CACHE_SIZE, TOOLS_CACHE_TTL, TOOLS_CACHE_SIZE,
+    SSE_SESSION_IDLE_TIMEOUT, EXEC_FANOUT_CONCURRENCY, DISCOVERY_THREADS
+)
 
 # Initialize the discovery service
 try:
@@ -31,32 +39,147 @@ except ImportError:
 
 # Try to import SSE components for services that require it
 try:
+    import anyio
     from mcp import ClientSession
     from mcp.client.sse import sse_client
+    from mcp.shared.exceptions import McpError
     from contextlib import AsyncExitStack
+    # Failures of the connection itself, as opposed to errors reported by the server
+    SSE_TRANSPORT_ERRORS = (
+        anyio.ClosedResourceError,
+        anyio.BrokenResourceError,
+        anyio.EndOfStream,
+        httpx.TransportError
+    )
     HAVE_SSE_SUPPORT = True
 except ImportError:
     HAVE_SSE_SUPPORT = False
     print("MCP SSE components not available. SSE-based services will not work.")
 
 # Define data models for our tools
-class SearchServerRequest(BaseModel):
-    query: str
-    top_k: Optional[int] = Field(default=3, description="Number of top results to return")
-
-class AddServerRequest(BaseModel):
-    server_name: str
-    server_description: str
-    server_endpoint: str
-    tools: List[Dict[str, Any]]
-
 class ExecToolRequest(BaseModel):
     target_server_name: str
     target_tool_name: str
     parameters: Dict[str, Any]
 
+# Shared HTTP client so tool calls reuse pooled keep-alive (HTTP/2) connections.
+# Created on first use and shared by every client session of this process.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it if needed."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=200)
+        )
+    return _http_client
+
+# FastMCP enters the lifespan once per client session (per connection under the
+# SSE and streamable-HTTP transports), so shared resources are started by the
+# first session and closed when the last one ends
+_active_sessions = 0
+_sse_sweeper: Optional[asyncio.Task] = None
+_discovery_executor: Optional[ThreadPoolExecutor] = None
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    """Start shared background tasks and close shared resources after the last session ends."""
+    global _active_sessions, _sse_sweeper, _http_client, _discovery_executor
+    # Discovery service calls block on network I/O and run in the default
+    # executor; install it once, since replacing it would leak the old pool
+    if _discovery_executor is None:
+        _discovery_executor = ThreadPoolExecutor(max_workers=DISCOVERY_THREADS)
+        asyncio.get_running_loop().set_default_executor(_discovery_executor)
+    if HAVE_SSE_SUPPORT and (_sse_sweeper is None or _sse_sweeper.done()):
+        _sse_sweeper = asyncio.create_task(_sweep_idle_sse_sessions())
+    _active_sessions += 1
+    try:
+        yield
+    finally:
+        _active_sessions -= 1
+        if _active_sessions == 0:
+            # Detach shared resources before awaiting, so a session that starts
+            # meanwhile creates fresh ones instead of using closing ones
+            sweeper, _sse_sweeper = _sse_sweeper, None
+            http_client, _http_client = _http_client, None
+            if sweeper is not None:
+                sweeper.cancel()
+                await asyncio.gather(sweeper, return_exceptions=True)
+            await _close_sse_sessions()
+            if http_client is not None:
+                await http_client.aclose()
+
 # Initialize the MCP server
-mcp = FastMCP("mcp-router", port=9000)
+mcp = FastMCP("mcp-router", port=9000, lifespan=_lifespan)
+
+# Cache of server name -> (endpoint, expires_at), kept in LRU order
+_endpoint_cache: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+_endpoint_cache_lock = asyncio.Lock()
+
+async def _get_server_endpoint(server_name: str) -> str:
+    """
+    Resolve a server endpoint, using the in-process cache when possible.
+    
+    Args:
+        server_name: Name of the server
+    """
+    async with _endpoint_cache_lock:
+        cached = _endpoint_cache.get(server_name)
+        if cached is not None:
+            endpoint, expires_at = cached
+            if expires_at > time.monotonic():
+                _endpoint_cache.move_to_end(server_name)
+                return endpoint
+            del _endpoint_cache[server_name]
+    
+    endpoint = await asyncio.to_thread(discovery_service.get_server_endpoint, server_name)
+    
+    async with _endpoint_cache_lock:
+        now = time.monotonic()
+        # Drop expired entries before enforcing the size bound
+        for name in [name for name, (_, expires_at) in _endpoint_cache.items() if expires_at <= now]:
+            del _endpoint_cache[name]
+        _endpoint_cache[server_name] = (endpoint, now + ENDPOINT_CACHE_TTL)
+        _endpoint_cache.move_to_end(server_name)
+        while len(_endpoint_cache) > ENDPOINT_CACHE_SIZE:
+            _endpoint_cache.popitem(last=False)
+    
+    return endpoint
+
+# Cache of server name -> (tools JSON, parsed tools, expires_at), kept in LRU order
+_tools_cache: "OrderedDict[str, tuple[str, list, float]]" = OrderedDict()
+
+def _cache_tools(server_name: str, tools_json: str, tools: list):
+    """Store the parsed tools for a server, evicting expired and least recently used entries."""
+    now = time.monotonic()
+    for name in [name for name, (_, _, expires_at) in _tools_cache.items() if expires_at <= now]:
+        del _tools_cache[name]
+    _tools_cache[server_name] = (tools_json, tools, now + TOOLS_CACHE_TTL)
+    _tools_cache.move_to_end(server_name)
+    while len(_tools_cache) > TOOLS_CACHE_SIZE:
+        _tools_cache.popitem(last=False)
+
+def _parse_tools(server_name: str, tools_json: str) -> list:
+    """
+    Parse a server's tools JSON, reusing the cached result when it is unchanged.
+    
+    Args:
+        server_name: Name of the server
+        tools_json: JSON string of the server's tools as stored in DashVector
+    """
+    cached = _tools_cache.get(server_name)
+    if cached is not None:
+        cached_json, tools, expires_at = cached
+        if cached_json == tools_json and expires_at > time.monotonic():
+            _tools_cache.move_to_end(server_name)
+            return tools
+    
+    tools = orjson.loads(tools_json)
+    _cache_tools(server_name, tools_json, tools)
+    return tools
 
 @mcp.tool()
 async def search_mcp_server(query: str, top_k: Optional[int] = 3) -> str:
@@ -69,15 +192,15 @@ async def search_mcp_server(query: str, top_k: Optional[int] = 3) -> str:
     """
     try:
         # Search for servers
-        results = discovery_service.search_server(query, top_k)
+        results = await asyncio.to_thread(discovery_service.search_server, query, top_k)
         
         # Parse tools JSON strings back to objects
         for result in results:
-            result["tools"] = json.loads(result["tools"])
+            result["tools"] = _parse_tools(result["server_name"], result["tools"])
         
-        return json.dumps(results, ensure_ascii=False)
+        return orjson.dumps(results).decode()
     except Exception as e:
-        return json.dumps({"error": str(e)}, ensure_ascii=False)
+        return orjson.dumps({"error": str(e)}).decode()
 
 @mcp.tool()
 async def add_mcp_server(
@@ -97,19 +220,27 @@ async def add_mcp_server(
     """
     try:
         # Serialize tools list to JSON string
-        tools_json = json.dumps(tools, ensure_ascii=False)
+        tools_json = orjson.dumps(tools).decode()
         
         # Add server to discovery service
-        result = discovery_service.add_server(
+        result = await asyncio.to_thread(
+            discovery_service.add_server,
             server_name,
             server_description,
             server_endpoint,
             tools_json
         )
         
-        return json.dumps(result, ensure_ascii=False)
+        # The endpoint may have changed, so drop any cached lookup
+        async with _endpoint_cache_lock:
+            _endpoint_cache.pop(server_name, None)
+        
+        # Replace any cached tools with the list we already have in memory
+        _cache_tools(server_name, tools_json, tools)
+        
+        return orjson.dumps(result).decode()
     except Exception as e:
-        return json.dumps({"error": str(e)}, ensure_ascii=False)
+        return orjson.dumps({"error": str(e)}).decode()
 
 @mcp.tool()
 async def exec_mcp_tool(
@@ -126,56 +257,196 @@ async def exec_mcp_tool(
         parameters: Parameters for the tool
     """
     try:
-        # Get target server endpoint
-        target_endpoint = discovery_service.get_server_endpoint(target_server_name)
-        
-        # Check if this is an SSE service (like AMap)
-        if "sse" in target_endpoint.lower() and HAVE_SSE_SUPPORT:
-            # Use SSE connection for services that require it
-            return await _execute_sse_tool(target_endpoint, target_tool_name, parameters)
-        else:
-            # Use HTTP POST for standard MCP services
-            return await _execute_http_tool(target_endpoint, target_tool_name, parameters)
+        return await _dispatch_tool(target_server_name, target_tool_name, parameters)
     except Exception as e:
-        return json.dumps({"error": str(e)}, ensure_ascii=False)
+        return orjson.dumps({"error": str(e)}).decode()
+
+# Bounds the number of concurrent tool calls made by exec_mcp_tools
+_exec_fanout_semaphore = asyncio.Semaphore(EXEC_FANOUT_CONCURRENCY)
+
+@mcp.tool()
+async def exec_mcp_tools(requests: List[ExecToolRequest]) -> str:
+    """
+    Execute several tools, possibly on different MCP servers, concurrently.
+    
+    Args:
+        requests: Tool calls to execute; results are returned in the same order
+    """
+    async def run(request: ExecToolRequest) -> str:
+        async with _exec_fanout_semaphore:
+            return await _dispatch_tool(
+                request.target_server_name,
+                request.target_tool_name,
+                request.parameters
+            )
+    
+    results = await asyncio.gather(*(run(request) for request in requests), return_exceptions=True)
+    
+    # Each result is already a JSON string, so join them rather than re-encoding
+    return "[" + ",".join(
+        orjson.dumps({"error": str(result)}).decode() if isinstance(result, BaseException) else result
+        for result in results
+    ) + "]"
+
+async def _dispatch_tool(target_server_name: str, target_tool_name: str, parameters: Dict[str, Any]) -> str:
+    """
+    Resolve the target server and execute a tool on it.
+    
+    Args:
+        target_server_name: Name of the target server
+        target_tool_name: Name of the tool to execute
+        parameters: Parameters for the tool
+    """
+    # Get target server endpoint
+    target_endpoint = await _get_server_endpoint(target_server_name)
+    
+    # Check if this is an SSE service (like AMap)
+    if "sse" in target_endpoint.lower() and HAVE_SSE_SUPPORT:
+        # Use SSE connection for services that require it
+        return await _execute_sse_tool(target_endpoint, target_tool_name, parameters)
+    else:
+        # Use HTTP POST for standard MCP services
+        return await _execute_http_tool(target_endpoint, target_tool_name, parameters)
+
+class _SSESession:
+    """
+    An initialized MCP client session over SSE, kept open for reuse.
+    
+    The SSE and session context managers are entered and exited by a single
+    owner task, since anyio requires them to be closed by the task that opened them.
+    """
+    
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.session = None
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+        self._ready = asyncio.get_running_loop().create_future()
+        self._close_event = asyncio.Event()
+        self._task = None
+    
+    @property
+    def closed(self) -> bool:
+        return self._task is None or self._task.done()
+    
+    async def start(self):
+        """Open the SSE connection and initialize the session."""
+        self._task = asyncio.create_task(self._run())
+        await self._ready
+    
+    async def _run(self):
+        try:
+            async with AsyncExitStack() as exit_stack:
+                # Create SSE client
+                streams = await exit_stack.enter_async_context(sse_client(self.endpoint))
+                
+                # Create and initialize session
+                session = await exit_stack.enter_async_context(ClientSession(streams[0], streams[1]))
+                await session.initialize()
+                
+                self.session = session
+                self._ready.set_result(None)
+                await self._close_event.wait()
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+    
+    async def call_tool(self, tool_name: str, parameters: Dict[str, Any]):
+        """Call a tool, keeping the session from being swept as idle until it returns."""
+        self.in_flight += 1
+        try:
+            return await self.session.call_tool(tool_name, parameters)
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+    
+    async def close(self):
+        """Close the session and its SSE connection."""
+        self._close_event.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+# Pool of open SSE sessions by endpoint, with a lock per endpoint guarding creation
+_sse_sessions: Dict[str, _SSESession] = {}
+_sse_session_locks: Dict[str, asyncio.Lock] = {}
+
+async def _get_sse_session(endpoint: str) -> _SSESession:
+    """
+    Return a pooled SSE session for the endpoint, opening one if needed.
+    
+    Args:
+        endpoint: The SSE endpoint URL
+    """
+    lock = _sse_session_locks.setdefault(endpoint, asyncio.Lock())
+    async with lock:
+        sse_session = _sse_sessions.get(endpoint)
+        if sse_session is None or sse_session.closed:
+            sse_session = _SSESession(endpoint)
+            await sse_session.start()
+            _sse_sessions[endpoint] = sse_session
+        sse_session.last_used = time.monotonic()
+        return sse_session
+
+async def _evict_sse_session(sse_session: _SSESession):
+    """Remove a session from the pool and close it."""
+    if _sse_sessions.get(sse_session.endpoint) is sse_session:
+        del _sse_sessions[sse_session.endpoint]
+    await sse_session.close()
+
+async def _sweep_idle_sse_sessions():
+    """Periodically close SSE sessions that have been idle too long."""
+    while True:
+        await asyncio.sleep(min(SSE_SESSION_IDLE_TIMEOUT, 60))
+        for sse_session in list(_sse_sessions.values()):
+            # Sessions with calls still running are never idle, however long the calls take
+            idle = sse_session.in_flight == 0 and (
+                time.monotonic() - sse_session.last_used > SSE_SESSION_IDLE_TIMEOUT
+            )
+            if sse_session.closed or idle:
+                await _evict_sse_session(sse_session)
+
+async def _close_sse_sessions():
+    """Close every pooled SSE session."""
+    for sse_session in list(_sse_sessions.values()):
+        await _evict_sse_session(sse_session)
 
 async def _execute_sse_tool(endpoint: str, tool_name: str, parameters: Dict[str, Any]) -> str:
     """
-    Execute a tool on a target MCP server using SSE connection.
+    Execute a tool on a target MCP server using a pooled SSE session.
     
     Args:
         endpoint: The SSE endpoint URL
         tool_name: Name of the tool to execute
         parameters: Parameters for the tool
     """
-    exit_stack = AsyncExitStack()
-    
+    sse_session = await _get_sse_session(endpoint)
     try:
-        # Create SSE client
-        sse_cm = sse_client(endpoint)
-        streams = await exit_stack.enter_async_context(sse_cm)
-        
-        # Create session
-        session_cm = ClientSession(streams[0], streams[1])
-        session = await exit_stack.enter_async_context(session_cm)
-        
-        # Initialize session
-        await session.initialize()
-        
-        # Execute tool
-        result = await session.call_tool(tool_name, parameters)
-        
-        # Convert result to dict if it's a CallToolResult object
-        if hasattr(result, '_asdict'):
-            result = result._asdict()
-        elif hasattr(result, '__dict__'):
-            result = result.__dict__
-        
-        # Return result as JSON
-        return json.dumps(result, ensure_ascii=False, default=str)
-    finally:
-        # Clean up
-        await exit_stack.aclose()
+        result = await sse_session.call_tool(tool_name, parameters)
+    except McpError:
+        # JSON-RPC errors and request timeouts come over a working connection,
+        # and the tool may already have run, so never retry them
+        raise
+    except Exception as e:
+        if not isinstance(e, SSE_TRANSPORT_ERRORS) and not sse_session.closed:
+            raise
+        # The pooled connection went stale; reconnect and retry once. Only the
+        # caller that finds it still pooled closes it, so concurrent calls that
+        # hit the same dead connection don't close each other's replacement
+        if _sse_sessions.get(endpoint) is sse_session:
+            await _evict_sse_session(sse_session)
+        sse_session = await _get_sse_session(endpoint)
+        result = await sse_session.call_tool(tool_name, parameters)
+    
+    # Convert result to dict if it's a CallToolResult object
+    if hasattr(result, '_asdict'):
+        result = result._asdict()
+    elif hasattr(result, '__dict__'):
+        result = result.__dict__
+    
+    # Return result as JSON
+    return orjson.dumps(result, default=str).decode()
 
 async def _execute_http_tool(endpoint: str, tool_name: str, parameters: Dict[str, Any]) -> str:
     """
@@ -198,16 +469,20 @@ async def _execute_http_tool(endpoint: str, tool_name: str, parameters: Dict[str
     }
     
     # Send request to target server
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            endpoint,
-            json=json_rpc_request,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        # Return the response from the target server
-        response_data = response.json()
-        return json.dumps(response_data, ensure_ascii=False)
+    response = await _get_http_client().post(
+        endpoint,
+        json=json_rpc_request,
+        headers={"Content-Type": "application/json"}
+    )
+    
+    # A JSON response is already the string we return, so pass it through
+    # instead of decoding and re-encoding it
+    if "application/json" in response.headers.get("content-type", ""):
+        return response.text
+    
+    # Otherwise make sure we hand back valid JSON
+    response_data = response.json()
+    return orjson.dumps(response_data).decode()
 
 if __name__ == "__main__":
     # Run the server
@@ -0,0 +1,165 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Use a JIT-compiled scan for cache lookups when numba is installed
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# Above this many cached rows the JIT scan splits rows across threads
+PARALLEL_SCAN_THRESHOLD = 256
+
+if HAVE_NUMBA:
+    @numba.njit(cache=True, fastmath=True)
+    def _scan_serial(mat, q, valid):
+        best, best_score = -1, -np.inf
+        for i in range(mat.shape[0]):
+            if valid[i]:
+                score = np.float32(0.0)
+                for j in range(mat.shape[1]):
+                    score += mat[i, j] * q[j]
+                if score > best_score:
+                    best, best_score = i, score
+        return best, best_score
+
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def _scan_parallel(mat, q, valid):
+        scores = np.full(mat.shape[0], -np.inf, dtype=np.float32)
+        for i in numba.prange(mat.shape[0]):
+            if valid[i]:
+                score = np.float32(0.0)
+                for j in range(mat.shape[1]):
+                    score += mat[i, j] * q[j]
+                scores[i] = score
+        best = int(np.argmax(scores))
+        return best, scores[best]
+
+    # Compile at import so the first lookup doesn't pay for it
+    _scan_serial(np.zeros((1, 1), dtype=np.float32), np.zeros(1, dtype=np.float32), np.ones(1, dtype=np.bool_))
+    _scan_parallel(np.zeros((1, 1), dtype=np.float32), np.zeros(1, dtype=np.float32), np.ones(1, dtype=np.bool_))
+
+
+def scan_cosine(mat, q, valid):
+    """
+    Find the valid row of mat with the highest dot product against q.
+
+    Args:
+        mat (np.ndarray): (N, D) float32 matrix of normalized embeddings
+        q (np.ndarray): (D,) float32 normalized query embedding
+        valid (np.ndarray): (N,) bool mask of rows to consider
+
+    Returns:
+        tuple: (row index, score); the score is -inf if no row is valid
+    """
+    if HAVE_NUMBA:
+        scan = _scan_parallel if mat.shape[0] > PARALLEL_SCAN_THRESHOLD else _scan_serial
+        best, score = scan(mat, q, valid)
+        return int(best), float(score)
+
+    scores = mat @ q
+    scores[~valid] = -np.inf
+    best = int(np.argmax(scores))
+    return best, float(scores[best])
+
+
+class QueryCache:
+    """Semantic cache of search results keyed on the query embedding."""
+
+    def __init__(self, max_size=1024, ttl=300.0, threshold=0.97):
+        """
+        Args:
+            max_size (int): Maximum number of cached queries
+            ttl (float): Seconds before a cached entry expires
+            threshold (float): Minimum cosine similarity for a cache hit
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        # Normalized embeddings live in one contiguous (max_size, D) matrix so a
+        # lookup is a single matrix-vector product; it is allocated on first put
+        # once the dimension is known
+        self._matrix = None
+        self._top_k = np.full(max_size, -1, dtype=np.int64)
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        self._results = [None] * max_size
+        # Number of slots handed out so far, and slots in LRU order
+        self._used = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def get(self, vector, top_k):
+        """
+        Return cached results for a similar query with the same top_k, or None.
+
+        Args:
+            vector: Query embedding
+            top_k (int): Number of results requested
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            if self._used == 0:
+                return None
+
+            used = self._used
+            valid = (self._top_k[:used] == top_k) & (self._expires_at[:used] > time.monotonic())
+            if not valid.any():
+                return None
+
+            # Embeddings are stored normalized, so cosine similarity is a dot product
+            slot, score = scan_cosine(self._matrix[:used], query, valid)
+            if score < self.threshold:
+                return None
+
+            self._lru.move_to_end(slot)
+            # Callers mutate the returned dicts, so hand out copies
+            return [dict(result) for result in self._results[slot]]
+
+    def put(self, vector, top_k, results):
+        """
+        Cache results for a query.
+
+        Args:
+            vector: Query embedding
+            top_k (int): Number of results requested
+            results (list): Search results to cache
+        """
+        query = self._normalize(vector)
+        results = [dict(result) for result in results]
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_size, query.shape[0]), dtype=np.float32)
+
+            slot = self._free_slot()
+            self._matrix[slot] = query
+            self._top_k[slot] = top_k
+            self._expires_at[slot] = time.monotonic() + self.ttl
+            self._results[slot] = results
+            self._lru[slot] = None
+
+    def _free_slot(self):
+        """Pick a slot for a new entry: unused, then expired, then least recently used."""
+        if self._used < self.max_size:
+            self._used += 1
+            return self._used - 1
+
+        expired = np.flatnonzero(self._expires_at[:self._used] <= time.monotonic())
+        slot = int(expired[0]) if expired.size else next(iter(self._lru))
+        del self._lru[slot]
+        return slot
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._top_k[:] = -1
+            self._results = [None] * self.max_size
+            self._used = 0
+            self._lru.clear()
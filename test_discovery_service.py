@@ -0,0 +1,164 @@
+import grpc
+import pytest
+from dashvector import Doc
+from dashvector.common.error import DashVectorGRPCException
+from dashvector.core.collection import Collection
+
+import discovery_service
+from discovery_service import DiscoveryService
+
+
+def unavailable():
+    """A collection handle as returned by the SDK when the server is unreachable."""
+    return Collection(exception=DashVectorGRPCException(grpc.StatusCode.UNAVAILABLE))
+
+
+class FakeResponse:
+    def __init__(self, output):
+        self.output = output
+        self.code = 0
+        self.message = ""
+
+    def __bool__(self):
+        return True
+
+
+class FakeCollection:
+    code = 0
+
+    def __init__(self):
+        self.docs = {}
+        self.fetch_calls = []
+        self.query_calls = []
+
+    def __bool__(self):
+        return True
+
+    def fetch(self, ids):
+        self.fetch_calls.append(ids)
+        return FakeResponse({doc_id: self.docs[doc_id] for doc_id in ids if doc_id in self.docs})
+
+    def query(self, *args, **kwargs):
+        self.query_calls.append((args, kwargs))
+        return FakeResponse([])
+
+
+class FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+        self.get_results = []
+        self.create_calls = []
+
+    def get(self, name):
+        if self.get_results:
+            return self.get_results.pop(0)
+        return self.collection
+
+    def create(self, *args, **kwargs):
+        self.create_calls.append((args, kwargs))
+        return FakeResponse(None)
+
+
+class FakeHandler:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FailedClient:
+    """A client whose startup check failed; its channel is still open."""
+
+    def __init__(self):
+        self._handler = FakeHandler()
+
+    def __bool__(self):
+        return False
+
+    def close(self):
+        pass  # Like the SDK, a failed client ignores close()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    client = FakeClient(FakeCollection())
+    embedding_calls = []
+
+    monkeypatch.setattr(discovery_service, "ROUTER_KV_PATH", str(tmp_path / "router_kv.db"))
+    monkeypatch.setattr(discovery_service, "WARMUP_ON_START", False)
+    monkeypatch.setattr(discovery_service, "_share_dashscope_session", lambda: False)
+    monkeypatch.setattr(discovery_service, "Client", lambda **kwargs: client)
+    monkeypatch.setattr(discovery_service.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(
+        discovery_service.TextEmbedding, "call", lambda **kwargs: embedding_calls.append(kwargs)
+    )
+
+    return DiscoveryService(), client, embedding_calls
+
+
+def test_get_server_endpoint_miss_raises_after_one_fetch(service):
+    discovery, client, embedding_calls = service
+    collection = client.collection
+
+    with pytest.raises(Exception, match="Server 'nonexistent' not found"):
+        discovery.get_server_endpoint("nonexistent")
+
+    assert collection.fetch_calls == [["nonexistent"]]
+    assert collection.query_calls == []
+    assert embedding_calls == []
+
+
+def test_connect_collection_retries_unavailable(service):
+    discovery, client, _ = service
+    client.get_results = [unavailable(), unavailable()]
+
+    assert discovery._connect_collection() is client.collection
+    assert client.get_results == []
+    assert client.create_calls == []
+
+
+def test_call_collection_reconnects_after_unavailable(service):
+    discovery, client, _ = service
+    discovery._collection = unavailable()
+
+    rsp = discovery._call_collection("query", [0.0], topk=1)
+
+    assert rsp
+    assert discovery.collection is client.collection
+    assert len(client.collection.query_calls) == 1
+
+
+def test_reconnect_replaces_and_closes_failed_client(service):
+    discovery, client, _ = service
+    failed = FailedClient()
+    discovery.client = failed
+
+    discovery._reconnect()
+
+    assert discovery.client is client
+    assert failed._handler.closed
+
+
+def test_get_server_endpoint_refetches_expired_entries(service, monkeypatch):
+    discovery, client, _ = service
+    discovery._store_endpoints([("weather", "http://old")])
+    client.collection.docs["weather"] = Doc(id="weather", fields={"server_endpoint": "http://new"})
+
+    assert discovery.get_server_endpoint("weather") == "http://old"
+
+    monkeypatch.setattr(discovery_service, "ROUTER_KV_TTL", 0)
+
+    assert discovery.get_server_endpoint("weather") == "http://new"
+    assert client.collection.fetch_calls == [["weather"]]
+
+
+def test_endpoint_store_is_scoped_to_the_collection(service, monkeypatch):
+    discovery, _, _ = service
+    discovery._store_endpoints([("weather", "http://old")])
+
+    monkeypatch.setattr(discovery_service, "COLLECTION_NAME", "other_collection")
+    other = DiscoveryService()
+
+    with pytest.raises(Exception, match="Server 'weather' not found"):
+        other.get_server_endpoint("weather")